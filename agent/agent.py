@@ -4,22 +4,84 @@ This agent demonstrates the full power of CopilotKit's useAgent hook through
 a natural human-in-the-loop source validation workflow.
 """
 
-from collections import defaultdict
+import asyncio
+import functools
+import time
 from datetime import datetime
 
 import structlog
-from ag_ui.core import EventType, StateSnapshotEvent
 from pydantic_ai import Agent, RunContext, ToolReturn
-from pydantic_ai.ag_ui import StateDeps
+from pydantic_ai.ag_ui import AGUIApp, StateDeps
 
 from dependencies import AgentDependencies
 from prompts import MAIN_SYSTEM_PROMPT
 from providers import get_llm_model
 from state import RAGState, RetrievedChunk, SearchQuery
-from tools import get_chunk_count, hybrid_search, semantic_search
+from state_events import state_delta, state_snapshot
+from tools import HybridSearchBatcher, get_chunk_count, semantic_search
 
 logger = structlog.get_logger(__name__)
 
+# Process-wide dependencies shared by all tool calls (created lazily)
+_deps: AgentDependencies | None = None
+_deps_lock = asyncio.Lock()
+_hybrid_batcher = HybridSearchBatcher()
+
+
+async def _get_deps() -> AgentDependencies:
+    """Get the shared, initialized AgentDependencies instance.
+
+    The database pool and OpenAI client are created on first use and
+    reused for the lifetime of the process.
+
+    Returns:
+        Initialized dependencies.
+    """
+    global _deps
+    if _deps is None:
+        async with _deps_lock:
+            if _deps is None:
+                deps = AgentDependencies()
+                await deps.initialize()
+                _deps = deps
+    return _deps
+
+
+async def close_dependencies() -> None:
+    """Close the shared dependencies (called on app shutdown)."""
+    global _deps
+    if _deps is not None:
+        await _deps.cleanup()
+        _deps = None
+
+
+# (expires_at, value) for the knowledge base chunk count
+_chunk_count_cache: tuple[float, int] | None = None
+
+
+async def _get_chunk_count_cached(deps: AgentDependencies) -> int:
+    """Get the knowledge base chunk count, cached for a short TTL.
+
+    The count only changes when documents are ingested, so repeated stats
+    requests and searches reuse a recent value instead of querying again.
+
+    Args:
+        deps: Agent dependencies with database pool.
+
+    Returns:
+        Total count of chunks.
+    """
+    global _chunk_count_cache
+    assert deps.settings is not None
+
+    now = time.monotonic()
+    if _chunk_count_cache is not None and now < _chunk_count_cache[0]:
+        return _chunk_count_cache[1]
+
+    count = await get_chunk_count(deps)
+    _chunk_count_cache = (now + deps.settings.chunk_count_cache_ttl, count)
+    return count
+
 
 def _assign_chunk_indices(chunks: list[RetrievedChunk]) -> list[RetrievedChunk]:
     """Assign per-document chunk indices to a list of chunks.
@@ -33,10 +95,11 @@ def _assign_chunk_indices(chunks: list[RetrievedChunk]) -> list[RetrievedChunk]:
     Returns:
         The same list with chunk_index fields populated.
     """
-    doc_counters: dict[str, int] = defaultdict(int)
+    doc_counters: dict[str, int] = {}
     for chunk in chunks:
-        doc_counters[chunk.document_id] += 1
-        chunk.chunk_index = doc_counters[chunk.document_id]
+        index = doc_counters.get(chunk.document_id, 0) + 1
+        doc_counters[chunk.document_id] = index
+        chunk.chunk_index = index
     return chunks
 
 # Create the RAG agent with AGUI support
@@ -84,10 +147,14 @@ async def search_knowledge_base(
     )
     state.current_query = search_query
 
+    count_task: asyncio.Task[int] | None = None
     try:
-        # Initialize dependencies for database access
-        agent_deps = AgentDependencies()
-        await agent_deps.initialize()
+        # Shared dependencies for database access
+        agent_deps = await _get_deps()
+
+        # Knowledge base size is independent of the search, so fetch it
+        # concurrently instead of after it
+        count_task = asyncio.create_task(_get_chunk_count_cached(agent_deps))
 
         logger.info(
             "search.started",
@@ -97,16 +164,27 @@ async def search_knowledge_base(
             similarity_threshold=config.similarity_threshold,
         )
 
+        # Embed once; reuse results from a near-duplicate earlier query if any
+        assert agent_deps.search_cache is not None
+        query_embedding = await agent_deps.get_embedding(query)
+        cached_chunks = agent_deps.search_cache.lookup(query_embedding, config)
+
         # Perform the search based on user's config
-        if config.search_type == "hybrid":
-            results = await hybrid_search(
-                deps=agent_deps,
-                query=query,
+        if cached_chunks is not None:
+            logger.info("search.cache_hit", query=query)
+            chunks = cached_chunks
+        elif config.search_type == "hybrid":
+            # Concurrent hybrid searches share one database round-trip
+            results = await _hybrid_batcher.submit(
+                agent_deps,
+                query,
+                query_embedding,
                 match_count=config.max_results,
             )
-            # Convert hybrid results to RetrievedChunk format
+            # Convert hybrid results to RetrievedChunk format (rows come from our
+            # own schema, so skip re-validating every field)
             chunks = [
-                RetrievedChunk(
+                RetrievedChunk.model_construct(
                     chunk_id=str(result["chunk_id"]),
                     document_id=str(result["document_id"]),
                     content=result["content"],
@@ -129,10 +207,12 @@ async def search_knowledge_base(
                 query=query,
                 match_count=config.max_results,
                 similarity_threshold=config.similarity_threshold,
+                query_embedding=query_embedding,
             )
-            # Convert SearchResult to RetrievedChunk
+            # Convert SearchResult to RetrievedChunk (rows come from our own
+            # schema, so skip re-validating every field)
             chunks = [
-                RetrievedChunk(
+                RetrievedChunk.model_construct(
                     chunk_id=result.chunk_id,
                     document_id=result.document_id,
                     content=result.content,
@@ -145,6 +225,9 @@ async def search_knowledge_base(
                 for result in results
             ]
 
+        if cached_chunks is None:
+            agent_deps.search_cache.add(query_embedding, config, chunks)
+
         # Assign per-document chunk indices and update state
         state.retrieved_chunks = _assign_chunk_indices(chunks)
         state.is_searching = False
@@ -165,18 +248,15 @@ async def search_knowledge_base(
         state.awaiting_approval = len(chunks) > 0
         state.approved_chunk_ids = []  # Reset approvals for new search
 
-        # Update search history (keep last 10)
+        # Update search history in place (keep last 10)
         state.search_history.append(search_query)
         if len(state.search_history) > 10:
-            state.search_history = state.search_history[-10:]
+            del state.search_history[:-10]
 
         # Get knowledge base stats
-        state.total_chunks_in_kb = await get_chunk_count(agent_deps)
+        state.total_chunks_in_kb = await count_task
         state.knowledge_base_status = "ready"
 
-        # Clean up
-        await agent_deps.cleanup()
-
         # Build message for the LLM (include chunk indices so agent can reference them)
         if chunks:
             sources = [
@@ -191,27 +271,25 @@ async def search_knowledge_base(
         return ToolReturn(
             return_value=message,
             metadata=[
-                StateSnapshotEvent(
-                    type=EventType.STATE_SNAPSHOT,
-                    snapshot=state.model_dump(),
-                ),
+                state_snapshot(state),
             ],
         )
 
     except Exception as e:
         # Handle errors gracefully
+        if count_task is not None and not count_task.done():
+            count_task.cancel()
         state.is_searching = False
         state.retrieved_chunks = []
         state.error_message = str(e)
         state.knowledge_base_status = f"error: {str(e)}"
 
+        # Errors are rare and the chunks were just cleared, so send the full
+        # state: a client that has none yet still gets the error
         return ToolReturn(
             return_value=f"Search failed: {str(e)}",
             metadata=[
-                StateSnapshotEvent(
-                    type=EventType.STATE_SNAPSHOT,
-                    snapshot=state.model_dump(),
-                ),
+                state_snapshot(state),
             ],
         )
 
@@ -264,23 +342,20 @@ async def get_state(
     lines.append(f"- Max results: {config.max_results}")
     lines.append(f"- Search type: {config.search_type}")
 
-    # Retrieved chunks
+    # Retrieved chunks and selection summary, built in a single pass
     lines.append(f"\n**Retrieved Chunks:** {len(state.retrieved_chunks)} total")
-    if state.retrieved_chunks:
-        for chunk in state.retrieved_chunks:
-            selected = "SELECTED" if chunk.chunk_id in approved_ids else "not selected"
-            lines.append(
-                f"- Chunk {chunk.chunk_index} of {chunk.document_title} "
-                f"({chunk.similarity:.0%} match) - {selected}"
-            )
+    selected_lines = []
+    for chunk in state.retrieved_chunks:
+        label = f"Chunk {chunk.chunk_index} of {chunk.document_title}"
+        if chunk.chunk_id in approved_ids:
+            lines.append(f"- {label} ({chunk.similarity:.0%} match) - SELECTED")
+            selected_lines.append(f"- {label}")
+        else:
+            lines.append(f"- {label} ({chunk.similarity:.0%} match) - not selected")
 
-    # Selection summary
     selected_count = len(approved_ids)
     lines.append(f"\n**User Selections:** {selected_count} chunk(s) selected")
-    if selected_count > 0:
-        selected_chunks = [c for c in state.retrieved_chunks if c.chunk_id in approved_ids]
-        for chunk in selected_chunks:
-            lines.append(f"- Chunk {chunk.chunk_index} of {chunk.document_title}")
+    lines.extend(selected_lines)
 
     # Error if any
     if state.error_message:
@@ -309,21 +384,15 @@ async def get_knowledge_base_stats(
     state = ctx.deps.state
 
     try:
-        agent_deps = AgentDependencies()
-        await agent_deps.initialize()
+        agent_deps = await _get_deps()
 
-        state.total_chunks_in_kb = await get_chunk_count(agent_deps)
+        state.total_chunks_in_kb = await _get_chunk_count_cached(agent_deps)
         state.knowledge_base_status = "ready"
 
-        await agent_deps.cleanup()
-
         return ToolReturn(
             return_value=f"Knowledge base has {state.total_chunks_in_kb} chunks. Status: ready.",
             metadata=[
-                StateSnapshotEvent(
-                    type=EventType.STATE_SNAPSHOT,
-                    snapshot=state.model_dump(),
-                ),
+                state_delta(state, "total_chunks_in_kb", "knowledge_base_status"),
             ],
         )
 
@@ -332,10 +401,8 @@ async def get_knowledge_base_stats(
         return ToolReturn(
             return_value=f"Error getting knowledge base stats: {str(e)}",
             metadata=[
-                StateSnapshotEvent(
-                    type=EventType.STATE_SNAPSHOT,
-                    snapshot=state.model_dump(),
-                ),
+                # Full state, so a client that has none yet still gets the error
+                state_snapshot(state),
             ],
         )
 
@@ -393,13 +460,10 @@ async def synthesize_with_sources(
     state.error_message = None
 
     # Build context from approved chunks (include chunk index for reference)
-    context_parts = []
-    for chunk in approved_chunks:
-        context_parts.append(
-            f"[Source: Chunk {chunk.chunk_index} of {chunk.document_title}]\n{chunk.content}"
-        )
-
-    context = "\n\n---\n\n".join(context_parts)
+    context = "\n\n---\n\n".join(
+        f"[Source: Chunk {chunk.chunk_index} of {chunk.document_title}]\n{chunk.content}"
+        for chunk in approved_chunks
+    )
 
     # Mark synthesis complete
     state.is_synthesizing = False
@@ -416,13 +480,16 @@ async def synthesize_with_sources(
     return ToolReturn(
         return_value=f"Here are the {len(approved_chunks)} approved sources to use for your answer:\n\n{context}",
         metadata=[
-            StateSnapshotEvent(
-                type=EventType.STATE_SNAPSHOT,
-                snapshot=state.model_dump(),
-            ),
+            state_delta(state, "is_synthesizing", "awaiting_approval", "error_message"),
         ],
     )
 
 
-# Convert agent to AGUI app
-app = rag_agent.to_ag_ui(deps=StateDeps(RAGState()))
+@functools.cache
+def get_app() -> AGUIApp[StateDeps[RAGState], str]:
+    """Convert the agent to an AGUI app (built once, on first use).
+
+    Returns:
+        The AGUI ASGI app serving the RAG agent.
+    """
+    return rag_agent.to_ag_ui(deps=StateDeps(RAGState()))
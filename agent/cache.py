@@ -0,0 +1,115 @@
+"""Semantic cache for search results.
+
+Near-duplicate queries (re-phrasings of the same question) are detected by
+cosine similarity of their embeddings, so they can reuse a previous result
+set instead of running the vector search again.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Sequence
+
+from state import RetrievedChunk
+
+
+def _normalize(embedding: Sequence[float]) -> list[float]:
+    """Return the L2-normalized copy of an embedding."""
+    norm = math.sqrt(math.sumprod(embedding, embedding))
+    if norm == 0:
+        return list(embedding)
+    return [x / norm for x in embedding]
+
+
+class SemanticCache:
+    """LRU cache of search results keyed by query embedding.
+
+    Entries are only matched against lookups made with the same
+    ``config_key`` (e.g. the frozen ``SearchConfig``), so changing the
+    search settings never returns results computed for other settings.
+
+    Entries expire ``ttl`` seconds after they are added, since ingestion
+    runs in another process and can replace the chunks they refer to.
+    """
+
+    def __init__(
+        self, threshold: float = 0.9, max_entries: int = 512, ttl: float = 300.0
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # id -> (config key, key hash, normalized embedding, chunks, expiry)
+        # in least- to most-recently-used order; the key hash is compared
+        # first so most mismatches skip a full equality check
+        self._entries: OrderedDict[
+            int, tuple[Hashable, int, list[float], list[RetrievedChunk], float]
+        ] = OrderedDict()
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self, embedding: Sequence[float], config_key: Hashable
+    ) -> list[RetrievedChunk] | None:
+        """Find cached results for a query embedding.
+
+        Args:
+            embedding: Embedding of the incoming query.
+            config_key: Search settings the results must have been made with.
+
+        Returns:
+            Copies of the cached chunks (with ``cache_hit`` set in their
+            metadata), or None if no unexpired entry is similar enough.
+        """
+        query = _normalize(embedding)
+        key_hash = hash(config_key)
+        now = time.monotonic()
+        best_id: int | None = None
+        best_score = self.threshold
+        for entry_id, (key, entry_hash, vector, _, expires) in self._entries.items():
+            if entry_hash != key_hash or key != config_key:
+                continue
+            if expires <= now or len(vector) != len(query):
+                continue
+            score = math.sumprod(vector, query)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+
+        self._entries.move_to_end(best_id)
+        chunks = self._entries[best_id][3]
+        return [
+            chunk.model_copy(update={"metadata": {**chunk.metadata, "cache_hit": True}})
+            for chunk in chunks
+        ]
+
+    def add(
+        self,
+        embedding: Sequence[float],
+        config_key: Hashable,
+        chunks: list[RetrievedChunk],
+    ) -> None:
+        """Store the results of a search, evicting the oldest entry if full.
+
+        Args:
+            embedding: Embedding of the query that produced the results.
+            config_key: Search settings used for the query.
+            chunks: Retrieved chunks to cache.
+        """
+        self._entries[self._next_id] = (
+            config_key,
+            hash(config_key),
+            _normalize(embedding),
+            [chunk.model_copy() for chunk in chunks],
+            time.monotonic() + self.ttl,
+        )
+        self._next_id += 1
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached results (e.g. after the knowledge base changes)."""
+        self._entries.clear()
@@ -1,12 +1,98 @@
 """Dependencies for the Interactive RAG Agent."""
 
+import asyncio
+from array import array
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass, field
 from typing import Any
 
 import asyncpg
 import openai
 
+from cache import SemanticCache
 from settings import load_settings
+from utils.db_utils import init_connection, to_float32
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into one API call.
+
+    Texts submitted within ``max_wait_ms`` of each other (or until
+    ``max_batch`` are pending) are embedded by a single request. Callers
+    asking for the same text in one batch share its embedding.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: dict[str, tuple[str, asyncio.Future[array[float]]]] = {}
+        self._embed: Callable[[list[str]], Awaitable[list[array[float]]]] | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(
+        self,
+        embed: Callable[[list[str]], Awaitable[list[array[float]]]],
+        key: str,
+        text: str,
+    ) -> array[float]:
+        """Queue a text for embedding and wait for its vector.
+
+        Args:
+            embed: Batched embedding function (e.g. ``get_embeddings``).
+            key: Normalized text used to share duplicate requests.
+            text: The text to embed.
+
+        Returns:
+            The embedding vector as a float32 array.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(key)
+        if pending is None:
+            future: asyncio.Future[array[float]] = loop.create_future()
+            self._pending[key] = (text, future)
+        else:
+            future = pending[1]
+        self._embed = embed
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        # Shielded so a cancelled caller does not cancel a shared future
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        """Start embedding all pending texts as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = list(self._pending.values()), {}
+        if batch and self._embed is not None:
+            task = asyncio.create_task(self._run(self._embed, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        embed: Callable[[list[str]], Awaitable[list[array[float]]]],
+        batch: list[tuple[str, asyncio.Future[array[float]]]],
+    ) -> None:
+        """Embed one batch and resolve each caller's future."""
+        try:
+            embeddings = await embed([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings, strict=True):
+            if not future.done():
+                future.set_result(embedding)
 
 
 @dataclass
@@ -22,6 +108,9 @@ class AgentDependencies:
     db_pool: asyncpg.Pool | None = None
     openai_client: openai.AsyncOpenAI | None = None
     settings: Any | None = None
+    search_cache: SemanticCache | None = None
+    embedding_cache: OrderedDict[str, array[float]] = field(default_factory=OrderedDict)
+    embedding_batcher: EmbeddingBatcher = field(default_factory=EmbeddingBatcher)
 
     # Session context
     session_id: str | None = None
@@ -39,6 +128,11 @@ class AgentDependencies:
                 self.settings.database_url,
                 min_size=self.settings.db_pool_min_size,
                 max_size=self.settings.db_pool_max_size,
+                max_queries=self.settings.db_pool_max_queries,
+                max_inactive_connection_lifetime=(
+                    self.settings.db_pool_max_inactive_lifetime
+                ),
+                init=init_connection,
             )
 
         # Initialize OpenAI client (or compatible provider)
@@ -48,20 +142,60 @@ class AgentDependencies:
                 base_url=self.settings.llm_base_url,
             )
 
+        # Initialize semantic cache for search results
+        if not self.search_cache:
+            self.search_cache = SemanticCache(
+                threshold=self.settings.semantic_cache_threshold,
+                max_entries=self.settings.semantic_cache_size,
+                ttl=self.settings.semantic_cache_ttl,
+            )
+
     async def cleanup(self) -> None:
         """Clean up external connections."""
         if self.db_pool:
             await self.db_pool.close()
             self.db_pool = None
 
-    async def get_embedding(self, text: str) -> list[float]:
+    async def get_embedding(self, text: str) -> array[float]:
         """Generate embedding for text using OpenAI.
 
+        Recent embeddings are kept in an LRU cache keyed by the
+        whitespace-normalized text, so repeated queries skip the API call.
+        Misses arriving together are embedded in one batched request.
+
         Args:
             text: The text to embed.
 
         Returns:
-            List of floats representing the embedding vector.
+            The embedding vector as a float32 array.
+        """
+        if not self.openai_client:
+            await self.initialize()
+
+        assert self.openai_client is not None
+        assert self.settings is not None
+
+        key = " ".join(text.split())
+        cached = self.embedding_cache.get(key)
+        if cached is not None:
+            self.embedding_cache.move_to_end(key)
+            return cached
+
+        embedding = await self.embedding_batcher.submit(self.get_embeddings, key, text)
+
+        self.embedding_cache[key] = embedding
+        if len(self.embedding_cache) > self.settings.embedding_cache_size:
+            self.embedding_cache.popitem(last=False)
+        return embedding
+
+    async def get_embeddings(self, texts: list[str]) -> list[array[float]]:
+        """Generate embeddings for several texts in one request.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            One float32 embedding vector per text, in input order.
         """
         if not self.openai_client:
             await self.initialize()
@@ -70,10 +204,12 @@ class AgentDependencies:
         assert self.settings is not None
 
         response = await self.openai_client.embeddings.create(
-            model=self.settings.embedding_model, input=text
+            model=self.settings.embedding_model, input=texts, encoding_format="base64"
         )
-        # Return as list of floats - asyncpg will handle conversion
-        return response.data[0].embedding
+        return [
+            to_float32(item.embedding)
+            for item in sorted(response.data, key=lambda d: d.index)
+        ]
 
     def set_user_preference(self, key: str, value: Any) -> None:
         """Set a user preference for the session."""
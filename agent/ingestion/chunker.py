@@ -1,11 +1,37 @@
 """Simple document chunking for the RAG agent demo."""
 
+import hashlib
 import re
 from dataclasses import dataclass
 from typing import Any
 
+# Markdown headers (levels 1-3) that start a new section
+_SECTION_RE = re.compile(r"(?=^#{1,3}\s+)", re.MULTILINE)
 
-@dataclass
+# Blank lines separating paragraphs
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Level-1 heading at the start of a section, used as the document title
+_TITLE_RE = re.compile(r"#\s+(.+)$", re.MULTILINE)
+
+
+def content_hash(text: str) -> int:
+    """Return a stable 64-bit hash of chunk text, used to skip duplicate embeddings."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def estimate_token_counts(texts: list[str]) -> list[int]:
+    """Estimate token counts for a batch of chunk texts.
+
+    Counting all chunks of a document in one call keeps this the single
+    place to swap in a batched tokenizer.
+    """
+    # Rough estimation: ~4 characters per token
+    return [len(text) // 4 for text in texts]
+
+
+@dataclass(slots=True)
 class ChunkingConfig:
     """Configuration for chunking."""
 
@@ -14,7 +40,7 @@ class ChunkingConfig:
     min_chunk_size: int = 100
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentChunk:
     """Represents a document chunk."""
 
@@ -22,12 +48,22 @@ class DocumentChunk:
     index: int
     metadata: dict[str, Any]
     token_count: int | None = None
+    content_hash: int = 0
 
     def __post_init__(self):
-        """Calculate token count if not provided."""
+        """Calculate token count if not provided and hash the content."""
         if self.token_count is None:
             # Rough estimation: ~4 characters per token
             self.token_count = len(self.content) // 4
+        self.content_hash = content_hash(self.content)
+
+
+@dataclass(slots=True)
+class ChunkedDocument:
+    """Chunks of a document together with the title found while chunking."""
+
+    title: str
+    chunks: list[DocumentChunk]
 
 
 class SimpleChunker:
@@ -57,82 +93,130 @@ class SimpleChunker:
         if not content.strip():
             return []
 
+        texts, _ = self._chunk_texts(content)
+        return self._build_chunks(texts, title, source, metadata)
+
+    def chunk_document_with_title(
+        self,
+        content: str,
+        default_title: str,
+        source: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> ChunkedDocument:
+        """Chunk a document and take its title from the first level-1 heading.
+
+        The heading is found in the same pass that splits the sections, so
+        the content is not scanned separately for the title.
+
+        Args:
+            content: Document content.
+            default_title: Title to use if the document has no heading.
+            source: Document source path.
+            metadata: Additional metadata.
+
+        Returns:
+            The document title and its chunks.
+        """
+        if not content.strip():
+            return ChunkedDocument(title=default_title, chunks=[])
+
+        texts, title = self._chunk_texts(content)
+        title = title or default_title
+        return ChunkedDocument(
+            title=title, chunks=self._build_chunks(texts, title, source, metadata)
+        )
+
+    def _build_chunks(
+        self,
+        texts: list[str],
+        title: str,
+        source: str,
+        metadata: dict[str, Any] | None,
+    ) -> list[DocumentChunk]:
+        """Wrap chunk texts in DocumentChunk objects with shared metadata."""
+        # Every chunk of a document carries identical metadata, so all
+        # chunks share this one dict rather than holding a copy each
         base_metadata = {
             "title": title,
             "source": source,
             **(metadata or {}),
         }
 
-        # Split on section headers first
-        sections = self._split_on_sections(content)
+        chunks = [
+            DocumentChunk(
+                content=text, index=i, metadata=base_metadata, token_count=tokens
+            )
+            for i, (text, tokens) in enumerate(
+                zip(texts, estimate_token_counts(texts), strict=True)
+            )
+        ]
 
-        chunks = []
-        chunk_index = 0
+        # Set total_chunks once on the shared metadata
+        base_metadata["total_chunks"] = len(chunks)
+
+        return chunks
+
+    def _chunk_texts(self, content: str) -> tuple[list[str], str | None]:
+        """Split content into chunk texts in document order.
+
+        Returns:
+            The chunk texts, and the first level-1 heading (or None).
+        """
+        texts: list[str] = []
+        title: str | None = None
+
+        # Split on section headers first. Every heading line starts a
+        # section, so the title can only appear at the start of one.
+        for raw_section in _SECTION_RE.split(content):
+            section = raw_section.strip()
+            if not section:
+                continue
+
+            if title is None and (match := _TITLE_RE.match(raw_section)):
+                title = match.group(1)
 
-        for section in sections:
-            section = section.strip()
             if len(section) < self.config.min_chunk_size:
                 continue
 
             # If section is small enough, use as-is
             if len(section) <= self.config.chunk_size:
-                chunks.append(
-                    DocumentChunk(
-                        content=section,
-                        index=chunk_index,
-                        metadata=base_metadata.copy(),
-                    )
-                )
-                chunk_index += 1
+                texts.append(section)
             else:
                 # Split large sections
-                section_chunks = self._split_section(section)
-                for chunk_text in section_chunks:
-                    chunks.append(
-                        DocumentChunk(
-                            content=chunk_text,
-                            index=chunk_index,
-                            metadata=base_metadata.copy(),
-                        )
-                    )
-                    chunk_index += 1
-
-        # Update total_chunks in metadata
-        for chunk in chunks:
-            chunk.metadata["total_chunks"] = len(chunks)
-
-        return chunks
+                texts.extend(self._split_section(section))
 
-    def _split_on_sections(self, content: str) -> list[str]:
-        """Split content on section headers."""
-        # Split on markdown headers
-        pattern = r"(?=^#{1,3}\s+)"
-        sections = re.split(pattern, content, flags=re.MULTILINE)
-        return [s for s in sections if s.strip()]
+        return texts, title
 
     def _split_section(self, text: str) -> list[str]:
         """Split a large section into smaller chunks."""
         chunks = []
-        paragraphs = re.split(r"\n\s*\n", text)
+        paragraphs = _PARAGRAPH_RE.split(text)
 
-        current_chunk = ""
+        # Collect paragraphs and join once per chunk to avoid re-copying
+        # the growing chunk for every paragraph
+        chunk_size = self.config.chunk_size
+        current_parts: list[str] = []
+        current_len = 0
 
         for para in paragraphs:
             para = para.strip()
-            if not para:
+            para_len = len(para)
+            if not para_len:
                 continue
 
-            potential = current_chunk + "\n\n" + para if current_chunk else para
+            potential_len = current_len + 2 + para_len if current_parts else para_len
 
-            if len(potential) <= self.config.chunk_size:
-                current_chunk = potential
+            if potential_len <= chunk_size:
+                current_parts.append(para)
+                current_len = potential_len
             else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = para
+                if current_parts:
+                    chunks.append("\n\n".join(current_parts))
+                current_parts = [para]
+                current_len = para_len
 
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_parts:
+            chunks.append("\n\n".join(current_parts))
 
         return chunks
 
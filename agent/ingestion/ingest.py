@@ -1,26 +1,153 @@
 """Simple document ingestion script for the RAG agent demo."""
 
 import asyncio
-import json
 import os
-import re
 import sys
+from array import array
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
+from typing import TextIO
 
 import asyncpg
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ingestion.chunker import ChunkingConfig, create_chunker
+from ingestion.chunker import ChunkingConfig, DocumentChunk, create_chunker
 from settings import load_settings
+from utils.db_utils import init_connection, to_float32
 
+# Maximum number of texts sent in one embeddings request
+EMBEDDING_BATCH_SIZE = 256
 
-async def generate_embedding(client, text: str, model: str) -> list[float]:
-    """Generate embedding for text using OpenAI."""
-    response = await client.embeddings.create(model=model, input=text)
-    return response.data[0].embedding
+# Embeddings requests sent concurrently for one document
+EMBEDDING_CONCURRENCY = 4
+
+# Embedded batches allowed to wait for insertion
+EMBEDDING_QUEUE_SIZE = 2
+
+# Embeddings kept for reuse by chunks with identical content
+EMBEDDING_CACHE_SIZE = 1024
+
+# Number of documents ingested concurrently (also the pool size)
+INGEST_CONCURRENCY = 5
+
+
+class ProgressWriter:
+    """Buffer progress lines from concurrent ingestion and write them in batches.
+
+    Lines are collected for up to ``interval`` seconds and written with a
+    single write and flush, instead of one print per message.
+    """
+
+    def __init__(self, stream: TextIO | None = None, interval: float = 0.1):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self._lines: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def write(self, line: str) -> None:
+        """Queue one line of output."""
+        self._lines.append(line)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.interval, self.flush
+            )
+
+    def flush(self) -> None:
+        """Write all queued lines now."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._lines:
+            self.stream.write("".join(f"{line}\n" for line in self._lines))
+            self.stream.flush()
+            self._lines = []
+
+
+async def generate_embeddings(
+    client, texts: list[str], model: str
+) -> list[array[float]]:
+    """Generate float32 embeddings for several texts in one OpenAI request."""
+    response = await client.embeddings.create(
+        model=model, input=texts, encoding_format="base64"
+    )
+    return [
+        to_float32(item.embedding)
+        for item in sorted(response.data, key=lambda d: d.index)
+    ]
+
+
+class EmbeddingCache:
+    """LRU of embeddings keyed by chunk content hash.
+
+    Shared across documents so repeated content (boilerplate sections,
+    license headers) is embedded once, while holding at most
+    ``max_entries`` vectors instead of one per chunk of the corpus.
+    """
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, array[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, content_hash: int) -> array[float] | None:
+        """Return the cached embedding for a content hash (or None)."""
+        embedding = self._entries.get(content_hash)
+        if embedding is not None:
+            self._entries.move_to_end(content_hash)
+        return embedding
+
+    def put(self, content_hash: int, embedding: array[float]) -> None:
+        """Store an embedding, evicting the least recently used if full."""
+        self._entries[content_hash] = embedding
+        self._entries.move_to_end(content_hash)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+async def embed_chunks(
+    client,
+    chunks: list[DocumentChunk],
+    model: str,
+    embedding_cache: EmbeddingCache,
+) -> list[array[float]]:
+    """Embed chunks, requesting only content that is not cached yet.
+
+    Missing texts are sent in one request, shortest first so similarly
+    sized inputs sit together.
+
+    Args:
+        client: OpenAI client for embeddings.
+        chunks: Chunks that need embeddings.
+        model: Embedding model name.
+        embedding_cache: Embeddings keyed by content hash (updated in place).
+
+    Returns:
+        One embedding per chunk, in the order of ``chunks``.
+    """
+    found: dict[int, array[float]] = {}
+    pending: dict[int, str] = {}
+    for chunk in chunks:
+        embedding = embedding_cache.get(chunk.content_hash)
+        if embedding is not None:
+            found[chunk.content_hash] = embedding
+        else:
+            pending.setdefault(chunk.content_hash, chunk.content)
+
+    if pending:
+        hashes = sorted(pending, key=lambda h: len(pending[h]))
+        embeddings = await generate_embeddings(
+            client, [pending[h] for h in hashes], model
+        )
+        for content_hash, embedding in zip(hashes, embeddings, strict=True):
+            found[content_hash] = embedding
+            embedding_cache.put(content_hash, embedding)
+
+    return [found[chunk.content_hash] for chunk in chunks]
 
 
 async def ingest_document(
@@ -30,6 +157,7 @@ async def ingest_document(
     settings,
     file_path: str,
     progress_callback=None,
+    embedding_cache: EmbeddingCache | None = None,
 ) -> dict:
     """Ingest a single document.
 
@@ -40,6 +168,8 @@ async def ingest_document(
         settings: Application settings.
         file_path: Path to the document.
         progress_callback: Optional progress callback.
+        embedding_cache: Optional cache of embeddings by chunk content hash,
+            shared across documents so duplicate chunks are embedded once.
 
     Returns:
         Ingestion result dict.
@@ -48,61 +178,114 @@ async def ingest_document(
     with open(file_path, encoding="utf-8") as f:
         content = f.read()
 
-    # Extract title from first heading or filename
-    title_match = re.search(r"^#\s+(.+)$", content, re.MULTILINE)
-    title = title_match.group(1) if title_match else Path(file_path).stem
     source = os.path.basename(file_path)
 
-    # Chunk the document
-    chunks = chunker.chunk_document(
+    # Chunk the document, taking the title from its first heading (found
+    # while chunking) or the filename
+    document = chunker.chunk_document_with_title(
         content=content,
-        title=title,
+        default_title=Path(file_path).stem,
         source=source,
         metadata={"file_path": file_path, "ingestion_date": datetime.now().isoformat()},
     )
+    title, chunks = document.title, document.chunks
 
     if not chunks:
         return {"title": title, "chunks_created": 0, "error": "No chunks created"}
 
-    # Insert document
-    async with pool.acquire() as conn:
-        doc_result = await conn.fetchrow(
-            """
-            INSERT INTO documents (title, source, content, metadata)
-            VALUES ($1, $2, $3, $4)
-            RETURNING id::text
-            """,
-            title,
-            source,
-            content,
-            json.dumps({"file_path": file_path}),
-        )
-        doc_id = doc_result["id"]
-
-        # Generate embeddings and insert chunks
-        for i, chunk in enumerate(chunks):
-            if progress_callback:
-                progress_callback(f"  Embedding chunk {i + 1}/{len(chunks)}")
-
-            embedding = await generate_embedding(
-                client, chunk.content, settings.embedding_model
-            )
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache()
 
-            # Convert to PostgreSQL vector format
-            embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+    # Embedding and inserting run as a pipeline: a producer embeds groups
+    # of EMBEDDING_CONCURRENCY batches concurrently while the consumer
+    # inserts earlier ones, with at most EMBEDDING_QUEUE_SIZE embedded
+    # batches waiting in between.
+    queue: asyncio.Queue[list[tuple[DocumentChunk, array[float]]] | None] = (
+        asyncio.Queue(maxsize=EMBEDDING_QUEUE_SIZE)
+    )
+    group_size = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
 
-            await conn.execute(
+    async def embed_batches() -> None:
+        try:
+            for start in range(0, len(chunks), group_size):
+                end = min(start + group_size, len(chunks))
+                group = [
+                    chunks[i : i + EMBEDDING_BATCH_SIZE]
+                    for i in range(start, end, EMBEDDING_BATCH_SIZE)
+                ]
+                embedded = await asyncio.gather(
+                    *(
+                        embed_chunks(
+                            client, batch, settings.embedding_model, embedding_cache
+                        )
+                        for batch in group
+                    )
+                )
+                if progress_callback:
+                    progress_callback(f"  Embedded {end}/{len(chunks)} chunks")
+                for batch, embeddings in zip(group, embedded, strict=True):
+                    await queue.put(list(zip(batch, embeddings, strict=True)))
+        except asyncio.CancelledError:
+            # The consumer stopped reading, so no end marker is needed (and
+            # putting one could block on a full queue forever)
+            raise
+        except Exception:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    producer = asyncio.create_task(embed_batches())
+    try:
+        # Wait for the first embedded batch before taking a connection, so
+        # none is held while the first embeddings requests are in flight
+        batch = await queue.get()
+        if batch is None:
+            # Surface the embedding error that ended the pipeline
+            await producer
+
+        # One transaction, so a failed embedding leaves no partial document
+        async with pool.acquire() as conn, conn.transaction():
+            # Insert document
+            doc_result = await conn.fetchrow(
                 """
-                INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
-                VALUES ($1::uuid, $2, $3::vector, $4, $5, $6)
+                INSERT INTO documents (title, source, content, metadata)
+                VALUES ($1, $2, $3, $4)
+                RETURNING id::text
                 """,
-                doc_id,
-                chunk.content,
-                embedding_str,
-                chunk.index,
-                json.dumps(chunk.metadata),
-                chunk.token_count,
+                title,
+                source,
+                content,
+                {"file_path": file_path},
             )
+            doc_id = doc_result["id"]
+
+            # Insert each embedded batch in one pipelined executemany
+            while batch is not None:
+                await conn.executemany(
+                    """
+                    INSERT INTO chunks (document_id, content, embedding, chunk_index, metadata, token_count)
+                    VALUES ($1::uuid, $2, $3, $4, $5, $6)
+                    """,
+                    [
+                        (
+                            doc_id,
+                            chunk.content,
+                            embedding,
+                            chunk.index,
+                            chunk.metadata,
+                            chunk.token_count,
+                        )
+                        for chunk, embedding in batch
+                    ],
+                )
+                batch = await queue.get()
+
+            # Surface embedding errors that ended the pipeline early
+            await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.wait([producer])
 
     return {"title": title, "chunks_created": len(chunks), "document_id": doc_id}
 
@@ -124,9 +307,11 @@ async def main():
         return
 
     # Initialize OpenAI client
+    # (extra retries back off on rate limits from concurrent documents)
     client = openai.AsyncOpenAI(
         api_key=settings.llm_api_key,
         base_url=settings.llm_base_url,
+        max_retries=5,
     )
 
     # Initialize database pool
@@ -134,7 +319,13 @@ async def main():
     pool = await asyncpg.create_pool(
         settings.database_url,
         min_size=1,
-        max_size=5,
+        max_size=INGEST_CONCURRENCY,
+        init=init_connection,
+        command_timeout=60,
+        # Don't wait for the WAL flush on every commit; a crash can only lose
+        # the most recent documents, which a re-run ingests again. Sent as a
+        # startup parameter so the pool's RESET ALL on release keeps it.
+        server_settings={"synchronous_commit": "off"},
     )
 
     # Create chunker
@@ -156,25 +347,41 @@ async def main():
     print(f"Found {len(files)} document(s) to ingest")
     print()
 
-    # Process each file
-    results = []
-    for i, file_path in enumerate(files):
-        print(f"[{i + 1}/{len(files)}] Processing: {file_path.name}")
-
-        def progress(msg):
-            print(msg)
-
-        try:
-            result = await ingest_document(
-                pool, client, chunker, settings, str(file_path), progress
-            )
-            results.append(result)
-            print(f"  Created {result['chunks_created']} chunks")
-        except Exception as e:
-            print(f"  Error: {e}")
-            results.append({"title": file_path.name, "error": str(e)})
-
-        print()
+    # Process files concurrently (embeddings are shared so duplicate chunks
+    # are embedded once)
+    embedding_cache = EmbeddingCache()
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+    output = ProgressWriter()
+
+    async def process(i: int, file_path: Path) -> dict:
+        async with semaphore:
+            prefix = f"[{i + 1}/{len(files)}] {file_path.name}:"
+            output.write(f"{prefix} Processing")
+
+            def progress(msg):
+                output.write(f"{prefix} {msg.strip()}")
+
+            try:
+                result = await ingest_document(
+                    pool,
+                    client,
+                    chunker,
+                    settings,
+                    str(file_path),
+                    progress,
+                    embedding_cache,
+                )
+                output.write(f"{prefix} Created {result['chunks_created']} chunks")
+                return result
+            except Exception as e:
+                output.write(f"{prefix} Error: {e}")
+                return {"title": file_path.name, "error": str(e)}
+
+    results = await asyncio.gather(
+        *(process(i, file_path) for i, file_path in enumerate(files))
+    )
+    output.flush()
+    print()
 
     # Print summary
     print("=" * 50)
@@ -197,4 +404,11 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Run on uvloop where uvicorn[standard] installed it (not on Windows),
+    # like the API server does
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop)
@@ -3,17 +3,29 @@
 This wraps the AGUI app with CORS and additional endpoints.
 """
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from agent import app as agui_app
+from agent import close_dependencies, get_app
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Tear down the shared database pool once on shutdown."""
+    yield
+    await close_dependencies()
+
 
 # Create FastAPI wrapper for additional endpoints and CORS
 api = FastAPI(
     title="Interactive RAG Agent API",
     description="RAG agent with human-in-the-loop source validation via AG-UI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend communication
@@ -36,7 +48,7 @@ async def health_check():
 
 
 # Mount AGUIApp at root - this handles the AG-UI protocol
-api.mount("/", agui_app)
+api.mount("/", get_app())
 
 
 if __name__ == "__main__":
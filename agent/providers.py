@@ -32,8 +32,9 @@ def get_llm_model(model_choice: str | None = None) -> OpenAIModel:
     return OpenAIModel(model_name, provider=provider)
 
 
+@lru_cache
 def get_embedding_client() -> AsyncOpenAI:
-    """Get an OpenAI client configured for embeddings.
+    """Get the shared OpenAI client configured for embeddings.
 
     Returns:
         AsyncOpenAI client for embedding generation.
@@ -1,5 +1,7 @@
 """Settings configuration for Interactive RAG Agent."""
 
+from functools import cache
+
 from dotenv import load_dotenv
 from pydantic import ConfigDict, Field
 from pydantic_settings import BaseSettings
@@ -57,6 +59,28 @@ class Settings(BaseSettings):
         default=0.5, description="Default minimum similarity score for results"
     )
 
+    # Cache Configuration
+    semantic_cache_threshold: float = Field(
+        default=0.9,
+        description="Cosine similarity above which a cached search result is reused",
+    )
+
+    semantic_cache_size: int = Field(
+        default=512, description="Maximum number of cached search results"
+    )
+
+    semantic_cache_ttl: float = Field(
+        default=300.0, description="Seconds a cached search result is reused"
+    )
+
+    embedding_cache_size: int = Field(
+        default=512, description="Maximum number of cached query embeddings"
+    )
+
+    chunk_count_cache_ttl: float = Field(
+        default=30.0, description="Seconds to cache the knowledge base chunk count"
+    )
+
     # Connection Pool Configuration
     db_pool_min_size: int = Field(
         default=5, description="Minimum database connection pool size"
@@ -66,6 +90,16 @@ class Settings(BaseSettings):
         default=20, description="Maximum database connection pool size"
     )
 
+    db_pool_max_queries: int = Field(
+        default=1_000_000,
+        description="Queries after which a pooled connection is replaced",
+    )
+
+    db_pool_max_inactive_lifetime: float = Field(
+        default=3600.0,
+        description="Seconds an idle pooled connection is kept open",
+    )
+
     # Embedding Configuration
     embedding_model: str = Field(
         default="text-embedding-3-small", description="OpenAI embedding model"
@@ -76,8 +110,13 @@ class Settings(BaseSettings):
     )
 
 
+@cache
 def load_settings() -> Settings:
-    """Load settings with proper error handling."""
+    """Load settings with proper error handling.
+
+    The environment is parsed once per process; later calls (e.g. when a
+    pool is closed and reopened) return the same instance.
+    """
     try:
         return Settings()
     except Exception as e:
@@ -13,6 +13,7 @@ DROP INDEX IF EXISTS idx_chunks_embedding;
 DROP INDEX IF EXISTS idx_chunks_document_id;
 DROP INDEX IF EXISTS idx_documents_metadata;
 DROP INDEX IF EXISTS idx_chunks_content_trgm;
+DROP FUNCTION IF EXISTS match_chunks(vector, INT);
 
 -- Documents table: stores full documents with metadata
 CREATE TABLE documents (
@@ -26,7 +27,7 @@ CREATE TABLE documents (
 );
 
 CREATE INDEX idx_documents_metadata ON documents USING GIN (metadata);
-CREATE INDEX idx_documents_created_at ON documents (created_at DESC);
+CREATE INDEX idx_documents_created_at_id ON documents (created_at DESC, id DESC);
 
 -- Chunks table: stores document chunks with embeddings
 CREATE TABLE chunks (
@@ -49,7 +50,8 @@ CREATE INDEX idx_chunks_content_trgm ON chunks USING GIN (content gin_trgm_ops);
 -- Function: Semantic search using vector similarity
 CREATE OR REPLACE FUNCTION match_chunks(
     query_embedding vector(1536),
-    match_count INT DEFAULT 10
+    match_count INT DEFAULT 10,
+    similarity_threshold FLOAT DEFAULT 0
 )
 RETURNS TABLE (
     chunk_id UUID,
@@ -75,6 +77,7 @@ BEGIN
     FROM chunks c
     JOIN documents d ON c.document_id = d.id
     WHERE c.embedding IS NOT NULL
+      AND c.embedding <=> query_embedding <= 1 - similarity_threshold
     ORDER BY c.embedding <=> query_embedding
     LIMIT match_count;
 END;
@@ -6,7 +6,7 @@ These models are the contract - field names must match exactly in the TypeScript
 
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class RetrievedChunk(BaseModel):
@@ -35,7 +35,12 @@ class RetrievedChunk(BaseModel):
 
 
 class SearchQuery(BaseModel):
-    """Model for a search query with metadata."""
+    """Model for a search query with metadata.
+
+    Immutable once recorded, so history entries can be shared safely.
+    """
+
+    model_config = ConfigDict(frozen=True)
 
     query: str = Field(description="The search query text")
     timestamp: str = Field(description="ISO timestamp when the query was made")
@@ -50,8 +55,13 @@ class SearchConfig(BaseModel):
 
     This model enables bidirectional state sync - users can adjust
     these settings in the frontend, and the agent respects them.
+
+    Frozen (and therefore hashable), so a config can key result caches
+    directly. The frontend replaces it as a whole rather than editing fields.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     similarity_threshold: float = Field(
         default=0.5, description="Minimum similarity score for results (0-1)"
     )
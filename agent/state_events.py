@@ -0,0 +1,48 @@
+"""AG-UI state events sent to the frontend from tool results."""
+
+from ag_ui.core import EventType, StateDeltaEvent, StateSnapshotEvent
+
+from state import RAGState
+
+
+def state_snapshot(state: RAGState) -> StateSnapshotEvent:
+    """Build a STATE_SNAPSHOT event carrying the full state.
+
+    The state is dumped in JSON mode so the AG-UI encoder (pydantic-core's
+    Rust JSON serializer) only has to write plain JSON values.
+
+    Args:
+        state: The current RAG state.
+
+    Returns:
+        StateSnapshotEvent for UI sync.
+    """
+    return StateSnapshotEvent(
+        type=EventType.STATE_SNAPSHOT,
+        snapshot=state.model_dump(mode="json"),
+    )
+
+
+def state_delta(state: RAGState, *fields: str) -> StateDeltaEvent:
+    """Build a STATE_DELTA event that sets only the given top-level fields.
+
+    Tools that change a few scalar fields use this instead of a full
+    STATE_SNAPSHOT, so the retrieved chunks are not re-serialized and
+    re-sent to the frontend. The patch uses "add" rather than "replace":
+    the frontend state may be empty or partial (e.g. in a fresh session),
+    and a "replace" of a missing key makes the whole patch fail to apply.
+
+    Args:
+        state: The current RAG state.
+        fields: Names of the RAGState fields that changed.
+
+    Returns:
+        StateDeltaEvent carrying a JSON Patch for the given fields.
+    """
+    values = state.model_dump(mode="json", include=set(fields))
+    return StateDeltaEvent(
+        type=EventType.STATE_DELTA,
+        delta=[
+            {"op": "add", "path": f"/{name}", "value": values[name]} for name in fields
+        ],
+    )
@@ -0,0 +1,103 @@
+"""Tests for the semantic search cache."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache import SemanticCache
+from state import RetrievedChunk
+
+
+def make_chunk(chunk_id: str = "chunk-1") -> RetrievedChunk:
+    """Create a retrieved chunk for testing."""
+    return RetrievedChunk(
+        chunk_id=chunk_id,
+        document_id="doc-id",
+        content="Test content",
+        similarity=0.9,
+        document_title="Test Doc",
+        document_source="test.md",
+    )
+
+
+class TestSemanticCache:
+    """Tests for SemanticCache."""
+
+    def test_empty_cache_misses(self):
+        """Test lookup on an empty cache."""
+        cache = SemanticCache()
+        assert cache.lookup([1.0, 0.0], "semantic") is None
+
+    def test_similar_query_hits(self):
+        """Test a near-duplicate embedding returns cached chunks."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+
+        result = cache.lookup([2.0, 0.1], "semantic")
+        assert result is not None
+        assert result[0].chunk_id == "chunk-1"
+        assert result[0].metadata["cache_hit"] is True
+
+    def test_dissimilar_query_misses(self):
+        """Test an unrelated embedding does not hit."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+        assert cache.lookup([0.0, 1.0], "semantic") is None
+
+    def test_config_key_must_match(self):
+        """Test results are not shared across search settings."""
+        cache = SemanticCache()
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+        assert cache.lookup([1.0, 0.0], "hybrid") is None
+
+    def test_hit_returns_copies(self):
+        """Test mutating returned chunks does not affect the cache."""
+        cache = SemanticCache()
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+
+        first = cache.lookup([1.0, 0.0], "semantic")
+        assert first is not None
+        first[0].chunk_index = 5
+
+        second = cache.lookup([1.0, 0.0], "semantic")
+        assert second is not None
+        assert second[0].chunk_index == 1
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = SemanticCache(max_entries=2)
+        cache.add([1.0, 0.0, 0.0], "semantic", [make_chunk("a")])
+        cache.add([0.0, 1.0, 0.0], "semantic", [make_chunk("b")])
+        cache.lookup([1.0, 0.0, 0.0], "semantic")  # touch "a"
+        cache.add([0.0, 0.0, 1.0], "semantic", [make_chunk("c")])
+
+        assert len(cache) == 2
+        assert cache.lookup([0.0, 1.0, 0.0], "semantic") is None
+        assert cache.lookup([1.0, 0.0, 0.0], "semantic") is not None
+
+    def test_clear(self):
+        """Test clearing the cache."""
+        cache = SemanticCache()
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_dimension_mismatch_misses(self):
+        """Test embeddings of a different size never match."""
+        cache = SemanticCache()
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+        assert cache.lookup([1.0, 0.0, 0.0], "semantic") is None
+
+    def test_expired_entry_misses(self, monkeypatch):
+        """Test entries stop matching once their TTL has passed."""
+        now = 1000.0
+        monkeypatch.setattr("cache.time.monotonic", lambda: now)
+        cache = SemanticCache(ttl=60.0)
+        cache.add([1.0, 0.0], "semantic", [make_chunk()])
+
+        now = 1059.0
+        assert cache.lookup([1.0, 0.0], "semantic") is not None
+        now = 1060.0
+        assert cache.lookup([1.0, 0.0], "semantic") is None
@@ -6,7 +6,13 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ingestion.chunker import ChunkingConfig, DocumentChunk, SimpleChunker, create_chunker
+from ingestion.chunker import (
+    ChunkingConfig,
+    DocumentChunk,
+    SimpleChunker,
+    create_chunker,
+    estimate_token_counts,
+)
 
 
 class TestChunkingConfig:
@@ -61,6 +67,14 @@ class TestDocumentChunk:
         )
         assert chunk.token_count == 50
 
+    def test_content_hash(self):
+        """Test identical content hashes the same and different content does not."""
+        a = DocumentChunk(content="Same text", index=0, metadata={})
+        b = DocumentChunk(content="Same text", index=3, metadata={"x": 1})
+        c = DocumentChunk(content="Other text", index=0, metadata={})
+        assert a.content_hash == b.content_hash
+        assert a.content_hash != c.content_hash
+
 
 class TestSimpleChunker:
     """Tests for SimpleChunker."""
@@ -164,3 +178,60 @@ Second paragraph with content.
         for chunk in chunks:
             assert "total_chunks" in chunk.metadata
             assert chunk.metadata["total_chunks"] == len(chunks)
+
+    def test_metadata_shared_across_chunks(self):
+        """Test that chunks of one document share a single metadata dict."""
+        config = ChunkingConfig(chunk_size=100, min_chunk_size=20)
+        chunker = SimpleChunker(config)
+        content = """# Section 1
+
+First paragraph with content.
+
+# Section 2
+
+Second paragraph with content.
+"""
+        chunks = chunker.chunk_document(
+            content=content,
+            title="Test",
+            source="test.md",
+        )
+        assert len(chunks) == 2
+        assert chunks[0].metadata is chunks[1].metadata
+
+    def test_token_counts_estimated_in_batch(self):
+        """Test chunk token counts come from the batch estimate."""
+        chunker = create_chunker()
+        content = "This is a longer piece of content. " * 10
+        chunks = chunker.chunk_document(
+            content=content,
+            title="Test",
+            source="test.md",
+        )
+        assert [c.token_count for c in chunks] == estimate_token_counts(
+            [c.content for c in chunks]
+        )
+
+    def test_title_from_first_heading(self):
+        """Test the title is taken from the first level-1 heading."""
+        chunker = create_chunker()
+        content = "## Intro\n\nSome text.\n\n# Real Title\n\n" + "Body text. " * 20
+        document = chunker.chunk_document_with_title(
+            content=content,
+            default_title="fallback",
+            source="test.md",
+        )
+        assert document.title == "Real Title"
+        assert document.chunks
+        assert all(c.metadata["title"] == "Real Title" for c in document.chunks)
+
+    def test_title_defaults_without_heading(self):
+        """Test the default title is used when there is no heading."""
+        chunker = create_chunker()
+        document = chunker.chunk_document_with_title(
+            content="No headings here. " * 20,
+            default_title="fallback",
+            source="test.md",
+        )
+        assert document.title == "fallback"
+        assert document.chunks[0].metadata["title"] == "fallback"
@@ -0,0 +1,444 @@
+"""Tests for database utilities."""
+
+import asyncio
+import base64
+import struct
+import sys
+from array import array
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import UUID
+
+import asyncpg
+import pytest
+from asyncpg import connect_utils
+from asyncpg.protocol import protocol as pgproto
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.db_utils import (
+    SQL_LIST_DOCUMENTS,
+    SQL_LIST_DOCUMENTS_AFTER,
+    DocumentLoader,
+    decode_jsonb,
+    decode_vector,
+    encode_jsonb,
+    encode_vector,
+    get_document_by_id,
+    get_document_with_chunks,
+    get_documents_by_ids,
+    init_connection,
+    invalidate_document_cache,
+    list_documents,
+    to_float32,
+    vector_array_param,
+)
+
+
+class TestVectorCodec:
+    """Tests for the pgvector binary codec."""
+
+    def test_encode_layout(self):
+        """Test encoding matches pgvector's binary format."""
+        data = encode_vector([1.0, -2.5])
+        assert data == struct.pack(">HHff", 2, 0, 1.0, -2.5)
+
+    def test_round_trip(self):
+        """Test decoding an encoded vector returns the same values."""
+        values = [0.5, -0.25, 3.0, 0.0]
+        assert decode_vector(encode_vector(values)) == values
+
+    def test_empty_vector(self):
+        """Test encoding a zero-length vector."""
+        assert decode_vector(encode_vector([])) == []
+
+    def test_to_float32_from_base64(self):
+        """Test decoding a base64 embedding as returned by the API."""
+        data = base64.b64encode(struct.pack("<2f", 0.5, -1.0)).decode()
+        assert to_float32(data).tolist() == [0.5, -1.0]
+        assert encode_vector(to_float32(data)) == encode_vector([0.5, -1.0])
+
+    def test_to_float32_from_floats(self):
+        """Test providers returning float lists are converted too."""
+        assert to_float32([0.5, -1.0]).tolist() == [0.5, -1.0]
+
+
+class TestJsonbCodec:
+    """Tests for the JSONB binary codec."""
+
+    def test_encode_layout(self):
+        """Test encoding prefixes the JSON text with the format version."""
+        assert encode_jsonb({"a": 1}) == b'\x01{"a": 1}'
+
+    def test_round_trip(self):
+        """Test decoding an encoded value returns the same value."""
+        value = {"title": "Doc", "total_chunks": 3, "tags": ["x", "ü"]}
+        assert decode_jsonb(encode_jsonb(value)) == value
+
+
+class TestInitConnection:
+    """Tests for the connection init hook."""
+
+    async def test_registers_binary_codecs(self):
+        """Test vector and jsonb codecs are registered in binary format."""
+        calls = {}
+
+        class FakeConnection:
+            async def set_type_codec(self, typename, **kwargs):
+                calls[typename] = kwargs
+
+        await init_connection(FakeConnection())
+
+        assert calls["vector"]["format"] == "binary"
+        assert calls["vector"]["encoder"] is encode_vector
+        assert calls["jsonb"]["format"] == "binary"
+        assert calls["jsonb"]["schema"] == "pg_catalog"
+        assert calls["jsonb"]["decoder"] is decode_jsonb
+
+
+ID_1 = "00000000-0000-0000-0000-000000000001"
+ID_2 = "00000000-0000-0000-0000-000000000002"
+ID_3 = "00000000-0000-0000-0000-000000000003"
+
+
+def make_row(document_id: str, title: str) -> tuple:
+    """Build a document row in the column order of the document queries."""
+    created = datetime(2025, 1, 1, tzinfo=UTC)
+    return (document_id, title, "doc.md", {}, created, created, "Content", 3)
+
+
+class FakePool:
+    """Minimal stand-in for an asyncpg pool that counts queries."""
+
+    def __init__(self, rows: dict[str, dict]):
+        self.rows = rows
+        self.queries = 0
+
+    async def fetchrow(self, query, document_id):
+        self.queries += 1
+        return self.rows.get(document_id)
+
+    async def fetch(self, query, document_ids):
+        self.queries += 1
+        return [self.rows[i] for i in document_ids if i in self.rows]
+
+
+class TestDocumentCache:
+    """Tests for the get_document_by_id cache."""
+
+    def setup_method(self):
+        invalidate_document_cache()
+
+    async def test_repeated_reads_hit_cache(self):
+        """Test a document is fetched once for repeated reads."""
+        pool = FakePool({ID_1: make_row(ID_1, "Doc")})
+        first = await get_document_by_id(pool, ID_1)
+        second = await get_document_by_id(pool, ID_1)
+        assert first is not None
+        assert first == second
+        assert first.title == "Doc"
+        assert first.content == "Content"
+        assert first.chunk_count == 3
+        assert pool.queries == 1
+
+    async def test_metadata_edits_do_not_reach_cache(self):
+        """Test callers cannot change the cached document's metadata."""
+        pool = FakePool({ID_1: make_row(ID_1, "Doc")})
+        first = await get_document_by_id(pool, ID_1)
+        assert first is not None
+        first.metadata["edited"] = True
+
+        second = await get_document_by_id(pool, ID_1)
+        assert second is not None
+        assert second.metadata == {}
+        second.metadata["edited"] = True
+
+        third = await get_document_by_id(pool, ID_1)
+        assert third is not None
+        assert third.metadata == {}
+        assert pool.queries == 1
+
+    async def test_invalidate(self):
+        """Test invalidation forces a fresh read."""
+        pool = FakePool({ID_1: make_row(ID_1, "Doc")})
+        await get_document_by_id(pool, ID_1)
+        invalidate_document_cache(ID_1)
+        await get_document_by_id(pool, ID_1)
+        assert pool.queries == 2
+
+    async def test_non_canonical_id_shares_entry(self):
+        """Test an upper-case ID hits the entry cached under the canonical ID."""
+        pool = FakePool({ID_1: make_row(ID_1, "Doc")})
+        await get_documents_by_ids(pool, [ID_1])
+        document = await get_document_by_id(pool, ID_1.upper())
+        assert document is not None and document.title == "Doc"
+        assert pool.queries == 1
+
+    async def test_invalidate_non_canonical_id(self):
+        """Test invalidating with a non-canonical ID drops the cached entry."""
+        pool = FakePool({ID_1: make_row(ID_1, "Doc")})
+        await get_document_by_id(pool, ID_1)
+        invalidate_document_cache("{" + ID_1.upper() + "}")
+        await get_document_by_id(pool, ID_1)
+        assert pool.queries == 2
+
+    async def test_missing_document_not_cached(self):
+        """Test missing documents are looked up again."""
+        pool = FakePool({})
+        assert await get_document_by_id(pool, ID_1) is None
+        assert await get_document_by_id(pool, ID_1) is None
+        assert pool.queries == 2
+
+
+class TestDocumentLoader:
+    """Tests for DocumentLoader."""
+
+    def setup_method(self):
+        invalidate_document_cache()
+
+    async def test_concurrent_loads_share_one_query(self):
+        """Test lookups in the same tick are fetched together."""
+        pool = FakePool(
+            {
+                ID_1: make_row(ID_1, "One"),
+                ID_2: make_row(ID_2, "Two"),
+            }
+        )
+        loader = DocumentLoader(pool)
+        one, two, missing = await asyncio.gather(
+            loader.load(ID_1), loader.load(ID_2), loader.load(ID_3)
+        )
+        assert one is not None and one.title == "One"
+        assert two is not None and two.title == "Two"
+        assert missing is None
+        assert pool.queries == 1
+
+
+class TestGetDocumentsByIds:
+    """Tests for get_documents_by_ids."""
+
+    def setup_method(self):
+        invalidate_document_cache()
+
+    async def test_fetches_in_one_query(self):
+        """Test several documents are fetched together and keyed by ID."""
+        pool = FakePool({ID_1: make_row(ID_1, "One"), ID_2: make_row(ID_2, "Two")})
+        documents = await get_documents_by_ids(pool, [ID_2, ID_3, ID_1])
+        assert list(documents) == [ID_2, ID_1]
+        assert documents[ID_1].title == "One"
+        assert pool.queries == 1
+
+        # Results are shared with the single-document cache
+        await get_document_by_id(pool, ID_1)
+        assert pool.queries == 1
+
+    async def test_empty_ids(self):
+        """Test no query is made without IDs."""
+        pool = FakePool({})
+        assert await get_documents_by_ids(pool, []) == {}
+        assert pool.queries == 0
+
+
+class RecordingPool:
+    """Stand-in pool that records the statement and arguments of a fetch."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return []
+
+
+class TestListDocuments:
+    """Tests for list_documents keyset pagination."""
+
+    async def test_first_page(self):
+        """Test the first page is fetched without a cursor."""
+        pool = RecordingPool()
+        await list_documents(pool, limit=10)
+        assert pool.calls == [(SQL_LIST_DOCUMENTS, (10,))]
+
+    async def test_next_page_seeks_after_cursor(self):
+        """Test later pages pass the last (created_at, id) as the cursor."""
+        pool = RecordingPool()
+        created = datetime(2024, 1, 1, tzinfo=UTC)
+        document_id = UUID("00000000-0000-0000-0000-000000000001")
+        await list_documents(pool, limit=10, after=(created, document_id))
+        assert pool.calls == [(SQL_LIST_DOCUMENTS_AFTER, (10, created, document_id))]
+
+
+class TestGetDocumentWithChunks:
+    """Tests for get_document_with_chunks."""
+
+    async def test_row_keyed_by_column(self):
+        """Test the row is returned as a dict keyed by its SELECT columns."""
+        created = datetime(2024, 1, 1, tzinfo=UTC)
+        chunks = [{"id": "chunk-1", "chunk_index": 0}]
+        pool = FakePool(
+            {"doc-1": ("doc-1", "Doc", "doc.md", "Text", {}, created, created, chunks)}
+        )
+
+        document = await get_document_with_chunks(pool, "doc-1")
+        assert document is not None
+        assert document["title"] == "Doc"
+        assert document["content"] == "Text"
+        assert document["chunks"] == chunks
+        assert await get_document_with_chunks(pool, "doc-2") is None
+
+
+VECTOR_OID = 90001
+VECTOR_ARRAY_OID = 90002
+
+
+def backend_message(kind: bytes, payload: bytes = b"") -> bytes:
+    """Frame a PostgreSQL backend protocol message."""
+    return kind + struct.pack("!i", len(payload) + 4) + payload
+
+
+class CaptureTransport(asyncio.Transport):
+    """Transport that keeps everything the client sends."""
+
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    def is_closing(self):
+        return False
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+    def close(self):
+        pass
+
+
+async def encode_bind_parameter(query: str, param_oid: int, value) -> bytes:
+    """Encode one query parameter with asyncpg's own protocol code.
+
+    Drives an asyncpg protocol through a scripted server conversation
+    (with the vector codec registered like ``init_connection`` does) and
+    returns the parameter bytes of the resulting Bind message.
+    """
+    loop = asyncio.get_running_loop()
+    params = connect_utils._ConnectionParameters(
+        user="test",
+        password=None,
+        database="test",
+        ssl=None,
+        sslmode=None,
+        ssl_negotiation=None,
+        server_settings=None,
+        target_session_attrs=None,
+        krbsrvname=None,
+        gsslib=None,
+    )
+    connected = loop.create_future()
+    protocol = pgproto.Protocol(("test", 5432), connected, params, asyncpg.Record, loop)
+    transport = CaptureTransport()
+    protocol.connection_made(transport)
+    protocol.data_received(
+        backend_message(b"R", struct.pack("!i", 0))
+        + backend_message(b"S", b"client_encoding\x00UTF8\x00")
+        + backend_message(b"Z", b"I")
+    )
+    await connected
+
+    settings = protocol.get_settings()
+    settings.add_python_codec(
+        VECTOR_OID, "vector", "public", [], "scalar",
+        encode_vector, decode_vector, "binary",
+    )  # fmt: skip
+    settings.register_data_types(
+        [
+            {
+                "oid": VECTOR_ARRAY_OID,
+                "ns": "public",
+                "name": "_vector",
+                "kind": b"b",
+                "basetype": None,
+                "elemtype": VECTOR_OID,
+                "elemdelim": b",",
+                "range_subtype": None,
+                "attrtypoids": None,
+                "attrnames": None,
+                "basetype_name": None,
+                "elemtype_name": "vector",
+                "range_subtype_name": None,
+                "depth": 0,
+            }
+        ]
+    )
+
+    prepare = asyncio.ensure_future(
+        protocol.prepare("stmt", query, pgproto.NO_TIMEOUT, record_class=asyncpg.Record)
+    )
+    await asyncio.sleep(0)
+    protocol.data_received(
+        backend_message(b"1")
+        + backend_message(b"t", struct.pack("!hi", 1, param_oid))
+        + backend_message(b"n")
+    )
+    state = await prepare
+    state._init_codecs()
+
+    transport.data.clear()
+    execute = asyncio.ensure_future(
+        protocol.bind_execute(state, [value], "", 0, False, pgproto.NO_TIMEOUT)
+    )
+    await asyncio.sleep(0)
+    if execute.done():
+        await execute  # raises the encoding error
+    bind = bytes(transport.data)
+    protocol.data_received(
+        backend_message(b"2")
+        + backend_message(b"C", b"SELECT 0\x00")
+        + backend_message(b"Z", b"I")
+    )
+    await execute
+
+    # Bind: type, length, portal, statement, format codes, then parameters
+    assert bind[:1] == b"B"
+    offset = bind.index(b"\x00", 5) + 1
+    offset = bind.index(b"\x00", offset) + 1
+    (formats,) = struct.unpack_from("!h", bind, offset)
+    offset += 2 + 2 * formats + 2
+    (length,) = struct.unpack_from("!i", bind, offset)
+    return bind[offset + 4 : offset + 4 + length]
+
+
+def decode_vector_array(data: bytes) -> list[list[float]]:
+    """Decode a one-dimensional binary array of vectors."""
+    ndims, _, elem_oid = struct.unpack_from("!iiI", data)
+    assert (ndims, elem_oid) == (1, VECTOR_OID)
+    (count,) = struct.unpack_from("!i", data, 12)
+    offset = 20
+    vectors = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("!i", data, offset)
+        vectors.append(decode_vector(data[offset + 4 : offset + 4 + length]))
+        offset += 4 + length
+    return vectors
+
+
+class TestVectorArrayParameter:
+    """Tests for passing embeddings as a vector[] parameter."""
+
+    async def test_round_trip_through_asyncpg(self):
+        """Test asyncpg encodes each embedding as one vector element."""
+        embeddings = [array("f", [1.0, 2.0, 3.0]), [4.0, 5.0, 6.0]]
+        data = await encode_bind_parameter(
+            "SELECT $1::vector[]", VECTOR_ARRAY_OID, vector_array_param(embeddings)
+        )
+        assert decode_vector_array(data) == [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+
+    async def test_plain_lists_are_rejected(self):
+        """Test why the tuples are needed: lists become a nested dimension."""
+        with pytest.raises(asyncpg.DataError, match="invalid array element"):
+            await encode_bind_parameter(
+                "SELECT $1::vector[]", VECTOR_ARRAY_OID, [[1.0, 2.0], [3.0, 4.0]]
+            )
@@ -3,6 +3,9 @@
 import sys
 from pathlib import Path
 
+import pytest
+from pydantic import ValidationError
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -62,6 +65,17 @@ class TestSearchConfig:
         assert config.max_results == 5
         assert config.search_type == "hybrid"
 
+    def test_config_is_hashable(self):
+        """Test equal configs hash alike so they can key caches."""
+        assert hash(SearchConfig(max_results=5)) == hash(SearchConfig(max_results=5))
+        assert SearchConfig(max_results=5) != SearchConfig(max_results=6)
+
+    def test_config_is_frozen(self):
+        """Test configs cannot be modified in place."""
+        config = SearchConfig()
+        with pytest.raises(ValidationError):
+            config.max_results = 3
+
 
 class TestSearchQuery:
     """Tests for SearchQuery model."""
@@ -0,0 +1,45 @@
+"""Tests for AG-UI state events."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+pytest.importorskip("ag_ui")
+
+from state import RAGState
+from state_events import state_delta, state_snapshot
+
+
+class TestStateDelta:
+    """Tests for state_delta."""
+
+    def test_uses_add_ops(self):
+        """Test fields are patched with "add", which also creates missing keys."""
+        state = RAGState(knowledge_base_status="ready", total_chunks_in_kb=12)
+        event = state_delta(state, "total_chunks_in_kb", "knowledge_base_status")
+        assert event.model_dump(mode="json")["delta"] == [
+            {"op": "add", "path": "/total_chunks_in_kb", "value": 12},
+            {"op": "add", "path": "/knowledge_base_status", "value": "ready"},
+        ]
+
+    def test_values_are_json(self):
+        """Test values are dumped in JSON mode."""
+        state = RAGState(error_message=None)
+        event = state_delta(state, "error_message")
+        assert event.model_dump(mode="json")["delta"] == [
+            {"op": "add", "path": "/error_message", "value": None}
+        ]
+
+
+class TestStateSnapshot:
+    """Tests for state_snapshot."""
+
+    def test_carries_full_state(self):
+        """Test the snapshot holds every state field."""
+        state = RAGState()
+        event = state_snapshot(state)
+        assert event.snapshot == state.model_dump(mode="json")
@@ -1,23 +1,30 @@
 """Search tools for the Interactive RAG Agent."""
 
-import json
+import asyncio
+from collections.abc import Sequence
+from dataclasses import dataclass, field
 from typing import Any
 
-from pydantic import BaseModel, Field
-
 from dependencies import AgentDependencies
+from utils.db_utils import vector_array_param
+
 
+@dataclass(slots=True, frozen=True, kw_only=True)
+class SearchResult:
+    """A search result row.
 
-class SearchResult(BaseModel):
-    """Model for search results."""
+    Only passed from the search functions to the agent (which converts it
+    to ``RetrievedChunk`` for the UI), so it is a plain slotted dataclass
+    rather than a validated model.
+    """
 
-    chunk_id: str = Field(description="Unique identifier for the chunk")
-    document_id: str = Field(description="ID of the source document")
-    content: str = Field(description="The actual text content")
-    similarity: float = Field(description="Similarity score (0-1)")
-    metadata: dict[str, Any] = Field(default_factory=dict)
-    document_title: str = Field(description="Title of the source document")
-    document_source: str = Field(description="Source/path of the document")
+    chunk_id: str  # Unique identifier for the chunk
+    document_id: str  # ID of the source document
+    content: str  # The actual text content
+    similarity: float  # Similarity score (0-1)
+    metadata: dict[str, Any] = field(default_factory=dict)
+    document_title: str  # Title of the source document
+    document_source: str  # Source/path of the document
 
 
 async def semantic_search(
@@ -25,6 +32,7 @@ async def semantic_search(
     query: str,
     match_count: int | None = None,
     similarity_threshold: float | None = None,
+    query_embedding: Sequence[float] | None = None,
 ) -> list[SearchResult]:
     """Perform pure semantic search using vector similarity.
 
@@ -33,6 +41,7 @@ async def semantic_search(
         query: Search query text.
         match_count: Number of results to return (default from settings).
         similarity_threshold: Minimum similarity score (default from settings).
+        query_embedding: Precomputed embedding of the query (optional).
 
     Returns:
         List of search results ordered by similarity.
@@ -49,20 +58,18 @@ async def semantic_search(
     # Validate match count
     match_count = min(match_count, deps.settings.max_match_count)
 
-    # Generate embedding for query
-    query_embedding = await deps.get_embedding(query)
+    # Generate embedding for query (before acquiring, so no connection is
+    # held during the API call)
+    if query_embedding is None:
+        query_embedding = await deps.get_embedding(query)
 
-    # Convert embedding to PostgreSQL vector string format
-    embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
-
-    # Execute semantic search
+    # Execute semantic search (the vector codec encodes the embedding)
     async with deps.db_pool.acquire() as conn:
         results = await conn.fetch(
             """
-            SELECT * FROM match_chunks($1::vector, $2)
-            WHERE similarity >= $3
+            SELECT * FROM match_chunks($1, $2, $3)
             """,
-            embedding_str,
+            query_embedding,
             match_count,
             similarity_threshold,
         )
@@ -74,7 +81,7 @@ async def semantic_search(
             document_id=str(row["document_id"]),
             content=row["content"],
             similarity=row["similarity"],
-            metadata=json.loads(row["metadata"]) if row["metadata"] else {},
+            metadata=row["metadata"] or {},
             document_title=row["document_title"],
             document_source=row["document_source"],
         )
@@ -87,6 +94,7 @@ async def hybrid_search(
     query: str,
     match_count: int | None = None,
     text_weight: float | None = None,
+    query_embedding: Sequence[float] | None = None,
 ) -> list[dict[str, Any]]:
     """Perform hybrid search combining semantic and keyword matching.
 
@@ -95,6 +103,7 @@ async def hybrid_search(
         query: Search query text.
         match_count: Number of results to return (default from settings).
         text_weight: Weight for text matching (0-1, default from settings).
+        query_embedding: Precomputed embedding of the query (optional).
 
     Returns:
         List of search results with combined scores.
@@ -114,53 +123,222 @@ async def hybrid_search(
     match_count = min(match_count, deps.settings.max_match_count)
     text_weight = max(0.0, min(1.0, text_weight))
 
-    # Generate embedding for query
-    query_embedding = await deps.get_embedding(query)
-
-    # Convert embedding to PostgreSQL vector string format
-    # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-    embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+    # Generate embedding for query (before acquiring, so no connection is
+    # held during the API call)
+    if query_embedding is None:
+        query_embedding = await deps.get_embedding(query)
 
-    # Execute hybrid search
+    # Execute hybrid search (the vector codec encodes the embedding)
     async with deps.db_pool.acquire() as conn:
         results = await conn.fetch(
             """
-            SELECT * FROM hybrid_search($1::vector, $2, $3, $4)
+            SELECT * FROM hybrid_search($1, $2, $3, $4)
             """,
-            embedding_str,
+            query_embedding,
             query,
             match_count,
             text_weight,
         )
 
     # Convert to dictionaries with additional scores
-    return [
-        {
-            "chunk_id": str(row["chunk_id"]),
-            "document_id": str(row["document_id"]),
-            "content": row["content"],
-            "combined_score": row["combined_score"],
-            "vector_similarity": row["vector_similarity"],
-            "text_similarity": row["text_similarity"],
-            "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
-            "document_title": row["document_title"],
-            "document_source": row["document_source"],
-        }
-        for row in results
-    ]
+    return [_hybrid_row_to_dict(row) for row in results]
+
+
+def _hybrid_row_to_dict(row: Any) -> dict[str, Any]:
+    """Convert a hybrid_search result row to a dictionary."""
+    return {
+        "chunk_id": str(row["chunk_id"]),
+        "document_id": str(row["document_id"]),
+        "content": row["content"],
+        "combined_score": row["combined_score"],
+        "vector_similarity": row["vector_similarity"],
+        "text_similarity": row["text_similarity"],
+        "metadata": row["metadata"] or {},
+        "document_title": row["document_title"],
+        "document_source": row["document_source"],
+    }
+
+
+async def hybrid_search_batch(
+    deps: AgentDependencies,
+    queries: list[str],
+    match_count: int | None = None,
+    text_weight: float | None = None,
+    query_embeddings: Sequence[Sequence[float]] | None = None,
+) -> list[list[dict[str, Any]]]:
+    """Run several hybrid searches in one database round-trip.
+
+    Missing embeddings are generated with a single embeddings request, and
+    all queries are executed by one SQL statement that calls
+    ``hybrid_search`` once per query via a lateral join.
+
+    Args:
+        deps: Agent dependencies with database pool and embedding client.
+        queries: Search query texts.
+        match_count: Number of results per query (default from settings).
+        text_weight: Weight for text matching (0-1, default from settings).
+        query_embeddings: Precomputed embeddings, parallel to ``queries``.
+
+    Returns:
+        One list of results per query, in the same order as ``queries``.
+    """
+    assert deps.settings is not None
+    assert deps.db_pool is not None
+
+    if not queries:
+        return []
+
+    # Use defaults if not specified
+    if match_count is None:
+        match_count = deps.settings.default_match_count
+    if text_weight is None:
+        text_weight = deps.user_preferences.get(
+            "text_weight", deps.settings.default_text_weight
+        )
+
+    # Validate parameters
+    match_count = min(match_count, deps.settings.max_match_count)
+    text_weight = max(0.0, min(1.0, text_weight))
+
+    # Generate all embeddings in one request
+    if query_embeddings is None:
+        query_embeddings = await deps.get_embeddings(queries)
+
+    # Execute all searches in one statement
+    async with deps.db_pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT q.ord, r.*
+            FROM unnest($1::vector[], $2::text[]) WITH ORDINALITY AS q(embedding, query_text, ord)
+            CROSS JOIN LATERAL hybrid_search(q.embedding, q.query_text, $3, $4) AS r
+            ORDER BY q.ord, r.combined_score DESC
+            """,
+            vector_array_param(query_embeddings),
+            queries,
+            match_count,
+            text_weight,
+        )
+
+    # Split rows back out per query (ord is 1-based)
+    results: list[list[dict[str, Any]]] = [[] for _ in queries]
+    for row in rows:
+        results[row["ord"] - 1].append(_hybrid_row_to_dict(row))
+    return results
+
+
+class HybridSearchBatcher:
+    """Coalesce concurrent hybrid searches into batched round-trips.
+
+    Searches submitted within ``max_wait_ms`` of each other (or until
+    ``max_batch`` are pending) are executed together by
+    ``hybrid_search_batch``.
+    """
+
+    def __init__(self, max_batch: int = 16, max_wait_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[
+            tuple[str, Sequence[float], int, asyncio.Future[list[dict[str, Any]]]]
+        ] = []
+        self._deps: AgentDependencies | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(
+        self,
+        deps: AgentDependencies,
+        query: str,
+        query_embedding: Sequence[float],
+        match_count: int,
+    ) -> list[dict[str, Any]]:
+        """Queue a hybrid search and wait for its results.
+
+        Args:
+            deps: Agent dependencies with database pool and embedding client.
+            query: Search query text.
+            query_embedding: Embedding of the query.
+            match_count: Number of results to return.
+
+        Returns:
+            Search results with combined scores.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[dict[str, Any]]] = loop.create_future()
+        self._deps = deps
+        self._pending.append((query, query_embedding, match_count, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        # Shielded like EmbeddingBatcher and DocumentLoader, so a cancelled
+        # caller leaves its future to be resolved by the batch
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        """Start executing all pending searches as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch and self._deps is not None:
+            task = asyncio.create_task(self._run(self._deps, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        deps: AgentDependencies,
+        batch: list[
+            tuple[str, Sequence[float], int, asyncio.Future[list[dict[str, Any]]]]
+        ],
+    ) -> None:
+        """Execute one batch and resolve each caller's future."""
+        try:
+            # Results are ordered by score, so the largest request covers
+            # every smaller one as a prefix
+            results = await hybrid_search_batch(
+                deps,
+                queries=[query for query, _, _, _ in batch],
+                match_count=max(count for _, _, count, _ in batch),
+                query_embeddings=[embedding for _, embedding, _, _ in batch],
+            )
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, count, future), rows in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(rows[:count])
+
+
+# Below this estimated size an exact COUNT(*) is cheap enough to run
+EXACT_COUNT_THRESHOLD = 100_000
 
 
 async def get_chunk_count(deps: AgentDependencies) -> int:
     """Get the total number of chunks in the knowledge base.
 
+    Large tables use the planner's row estimate from ``pg_class`` instead
+    of a full scan; small or never-analyzed tables are counted exactly.
+
     Args:
         deps: Agent dependencies with database pool.
 
     Returns:
-        Total count of chunks.
+        Total count of chunks (approximate for large tables).
     """
     assert deps.db_pool is not None
 
     async with deps.db_pool.acquire() as conn:
+        estimate = await conn.fetchval(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'chunks'::regclass"
+        )
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return int(estimate)
         count = await conn.fetchval("SELECT COUNT(*) FROM chunks")
         return count or 0
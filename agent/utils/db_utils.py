@@ -1,32 +1,275 @@
 """Database utilities for the RAG agent."""
 
+import asyncio
+import base64
+import json
+import struct
 import sys
-from pathlib import Path
+import textwrap
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass, replace
+from datetime import datetime
 from typing import Any
+from uuid import UUID
 
 import asyncpg
 
-# Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from settings import load_settings
 
 
+def _sql(query: str) -> str:
+    """Dedent and strip a query once, so calls send only its significant text."""
+    return textwrap.dedent(query).strip()
+
+
+# Document queries, kept as module constants so every call sends the same
+# text and hits asyncpg's per-connection prepared statement cache
+SQL_GET_DOCUMENT = _sql("""
+    SELECT
+        d.id, d.title, d.source, d.metadata, d.created_at, d.updated_at, d.content,
+        (SELECT count(*) FROM chunks c WHERE c.document_id = d.id) AS chunk_count
+    FROM documents d
+    WHERE d.id = $1
+""")
+
+# Keyset pagination on (created_at, id): later pages seek past the last row
+# of the previous one in idx_documents_created_at_id instead of scanning
+# and discarding an OFFSET. The first page is a separate statement so both
+# plans can use the index.
+SQL_LIST_DOCUMENTS = _sql("""
+    SELECT id, title, source, metadata, created_at, updated_at
+    FROM documents
+    ORDER BY created_at DESC, id DESC
+    LIMIT $1
+""")
+
+SQL_LIST_DOCUMENTS_AFTER = _sql("""
+    SELECT id, title, source, metadata, created_at, updated_at
+    FROM documents
+    WHERE (created_at, id) < ($2, $3)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $1
+""")
+
+
+def _json_array(query: str) -> str:
+    """Wrap a document listing so PostgreSQL returns it as one JSON array text.
+
+    json_agg does not keep the subquery's order, so it sorts again by the
+    listing's (created_at, id) keys.
+    """
+    return (
+        "SELECT COALESCE(json_agg(d ORDER BY d.created_at DESC, d.id DESC), '[]')::text"
+        f" FROM (\n{query}\n) d"
+    )
+
+
+SQL_LIST_DOCUMENTS_JSON = _json_array(SQL_LIST_DOCUMENTS)
+SQL_LIST_DOCUMENTS_AFTER_JSON = _json_array(SQL_LIST_DOCUMENTS_AFTER)
+
+SQL_GET_DOCUMENT_CHUNKS = _sql("""
+    SELECT id, content, chunk_index, metadata, token_count
+    FROM chunks
+    WHERE document_id = $1
+    ORDER BY chunk_index
+""")
+
+SQL_GET_DOCUMENT_WITH_CHUNKS = _sql("""
+    SELECT
+        d.id, d.title, d.source, d.content, d.metadata, d.created_at, d.updated_at,
+        COALESCE(
+            (
+                SELECT jsonb_agg(
+                    jsonb_build_object(
+                        'id', c.id,
+                        'content', c.content,
+                        'chunk_index', c.chunk_index,
+                        'metadata', c.metadata,
+                        'token_count', c.token_count
+                    )
+                    ORDER BY c.chunk_index
+                )
+                FROM chunks c
+                WHERE c.document_id = d.id
+            ),
+            '[]'::jsonb
+        ) AS chunks
+    FROM documents d
+    WHERE d.id = $1
+""")
+
+# Keys of SQL_GET_DOCUMENT_WITH_CHUNKS rows in SELECT order, so rows are
+# converted with dict(zip(...)) instead of a name lookup per column
+_DOCUMENT_WITH_CHUNKS_COLUMNS = (
+    "id",
+    "title",
+    "source",
+    "content",
+    "metadata",
+    "created_at",
+    "updated_at",
+    "chunks",
+)
+
+SQL_GET_DOCUMENTS_BY_IDS = _sql("""
+    SELECT
+        d.id, d.title, d.source, d.metadata, d.created_at, d.updated_at, d.content,
+        (SELECT count(*) FROM chunks c WHERE c.document_id = d.id) AS chunk_count
+    FROM unnest($1::uuid[]) WITH ORDINALITY AS t(id, ord)
+    JOIN documents d ON d.id = t.id
+    ORDER BY t.ord
+""")
+
+
+@dataclass(slots=True, frozen=True)
+class Document:
+    """A stored document.
+
+    Fields follow the column order of the document queries, so rows are
+    unpacked positionally (``Document(*row)``).
+    """
+
+    id: UUID
+    title: str
+    source: str
+    metadata: dict[str, Any]
+    created_at: datetime
+    updated_at: datetime
+    # Only selected when fetching documents by ID, not when listing them
+    content: str | None = None
+    chunk_count: int | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class Chunk:
+    """A stored document chunk (in ``SQL_GET_DOCUMENT_CHUNKS`` column order)."""
+
+    id: UUID
+    content: str
+    chunk_index: int
+    metadata: dict[str, Any]
+    token_count: int | None
+
+
+# Documents fetched by get_document_by_id are reused for this many seconds
+DOCUMENT_CACHE_TTL = 60.0
+
+# Maximum number of documents kept in the cache
+DOCUMENT_CACHE_SIZE = 10_000
+
+# Document ID -> (expiry time, document), least recently used first
+_document_cache: OrderedDict[str, tuple[float, Document]] = OrderedDict()
+
+
+def to_float32(embedding: str | Sequence[float]) -> array[float]:
+    """Convert an embedding from the OpenAI API into a float32 array.
+
+    Embeddings requested with ``encoding_format="base64"`` are raw
+    little-endian float32 bytes and are copied straight into the array
+    without creating a Python float per value. Providers that ignore the
+    format and return a list of floats are converted as well.
+    """
+    if not isinstance(embedding, str):
+        return array("f", embedding)
+    floats = array("f", base64.b64decode(embedding))
+    if sys.byteorder == "big":
+        floats.byteswap()
+    return floats
+
+
+def encode_vector(values: Sequence[float]) -> bytes:
+    """Encode floats in pgvector's binary format (dim, unused, float4s)."""
+    floats = array("f", values)
+    if sys.byteorder == "little":
+        floats.byteswap()
+    return struct.pack(">HH", len(floats), 0) + floats.tobytes()
+
+
+def vector_array_param(
+    embeddings: Sequence[Sequence[float]],
+) -> list[tuple[float, ...]]:
+    """Prepare embeddings for a ``vector[]`` query parameter.
+
+    asyncpg encodes a list or array element of an array parameter as a
+    nested dimension (so ``encode_vector`` would get single floats), but
+    passes tuples whole to the element codec.
+    """
+    return [tuple(embedding) for embedding in embeddings]
+
+
+def decode_vector(data: bytes) -> list[float]:
+    """Decode a pgvector binary value into a list of floats."""
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+def encode_jsonb(value: Any) -> bytes:
+    """Encode a value in JSONB's binary format (version byte, JSON text)."""
+    return b"\x01" + json.dumps(value).encode()
+
+
+def decode_jsonb(data: bytes) -> Any:
+    """Decode a JSONB binary value."""
+    return json.loads(data[1:])
+
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    """Register type codecs on a new connection (pool ``init`` hook).
+
+    - ``vector`` uses a binary codec, so embeddings are passed as plain
+      float sequences instead of '[1.0,2.0,...]' strings that the server
+      has to parse again.
+    - ``jsonb`` uses a binary codec, so metadata columns come
+      back as dicts and callers never parse JSON per row.
+
+    Args:
+        conn: Newly opened database connection.
+    """
+    await conn.set_type_codec(
+        "vector",
+        schema="public",
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary",
+    )
+    await conn.set_type_codec(
+        "jsonb",
+        schema="pg_catalog",
+        encoder=encode_jsonb,
+        decoder=decode_jsonb,
+        format="binary",
+    )
+
+
 class DatabasePool:
     """Wrapper for asyncpg connection pool with lifecycle management."""
 
     _pool: asyncpg.Pool | None = None
+    _lock = asyncio.Lock()
 
     @classmethod
     async def get_pool(cls) -> asyncpg.Pool:
-        """Get or create the database connection pool."""
+        """Get or create the database connection pool.
+
+        Concurrent first callers wait on a lock, so only one pool is created.
+        """
         if cls._pool is None:
-            settings = load_settings()
-            cls._pool = await asyncpg.create_pool(
-                settings.database_url,
-                min_size=settings.db_pool_min_size,
-                max_size=settings.db_pool_max_size,
-            )
+            async with cls._lock:
+                if cls._pool is None:
+                    settings = load_settings()
+                    cls._pool = await asyncpg.create_pool(
+                        settings.database_url,
+                        min_size=settings.db_pool_min_size,
+                        max_size=settings.db_pool_max_size,
+                        max_queries=settings.db_pool_max_queries,
+                        max_inactive_connection_lifetime=(
+                            settings.db_pool_max_inactive_lifetime
+                        ),
+                        init=init_connection,
+                    )
         return cls._pool
 
     @classmethod
@@ -39,60 +282,234 @@ class DatabasePool:
 
 async def get_document_by_id(
     pool: asyncpg.Pool, document_id: str
-) -> dict[str, Any] | None:
+) -> Document | None:
     """Retrieve a document by ID.
 
+    Found documents are cached for ``DOCUMENT_CACHE_TTL`` seconds; call
+    ``invalidate_document_cache`` after modifying a document. Callers get
+    their own copy of the ``metadata`` dict, so editing it never changes
+    the cached document.
+
     Args:
         pool: Database connection pool.
         document_id: The document UUID.
 
     Returns:
-        Document data as a dictionary or None if not found.
+        The document, or None if not found.
     """
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT id, title, source, content, metadata, created_at, updated_at
-            FROM documents
-            WHERE id = $1
-            """,
-            document_id,
-        )
-        if row:
-            return dict(row)
+    key = _cache_key(document_id)
+    cached = _get_cached_document(key)
+    if cached is not None:
+        return cached
+
+    row = await pool.fetchrow(SQL_GET_DOCUMENT, key)
+    if not row:
+        _document_cache.pop(key, None)
         return None
 
+    document = Document(*row)
+    _cache_document(key, document)
+    return document
+
+
+def _cache_key(document_id: str | UUID) -> str:
+    """Return the canonical cache key for a document ID.
+
+    Every cache access goes through this, so IDs differing only in case or
+    formatting share one entry. Raises ValueError for a malformed ID.
+    """
+    return str(UUID(str(document_id)))
+
+
+def _copy_document(document: Document) -> Document:
+    """Return a document with its own copy of the (mutable) metadata dict."""
+    return replace(document, metadata=dict(document.metadata))
+
+
+def _get_cached_document(key: str) -> Document | None:
+    """Return a copy of a cached, unexpired document (or None)."""
+    cached = _document_cache.get(key)
+    if cached is None or cached[0] <= time.monotonic():
+        return None
+    _document_cache.move_to_end(key)
+    return _copy_document(cached[1])
+
+
+def _cache_document(key: str, document: Document) -> None:
+    """Store a copy of a document, evicting the oldest entry if full."""
+    _document_cache[key] = (
+        time.monotonic() + DOCUMENT_CACHE_TTL,
+        _copy_document(document),
+    )
+    _document_cache.move_to_end(key)
+    if len(_document_cache) > DOCUMENT_CACHE_SIZE:
+        _document_cache.popitem(last=False)
+
+
+def invalidate_document_cache(document_id: str | None = None) -> None:
+    """Drop a cached document, or every cached document if no ID is given.
+
+    Args:
+        document_id: The document UUID to drop (optional).
+    """
+    if document_id is None:
+        _document_cache.clear()
+    else:
+        _document_cache.pop(_cache_key(document_id), None)
+
+
+async def get_documents_by_ids(
+    pool: asyncpg.Pool, document_ids: Sequence[str]
+) -> dict[str, Document]:
+    """Retrieve several documents in one query.
+
+    Found documents are added to the ``get_document_by_id`` cache.
+
+    Args:
+        pool: Database connection pool.
+        document_ids: The document UUIDs.
+
+    Returns:
+        Documents keyed by their ID as a string, in the order of
+        ``document_ids`` (e.g. search rank); IDs that were not found are
+        absent.
+    """
+    if not document_ids:
+        return {}
+
+    rows = await pool.fetch(SQL_GET_DOCUMENTS_BY_IDS, list(document_ids))
+
+    documents = {}
+    for row in rows:
+        document = Document(*row)
+        key = _cache_key(document.id)
+        documents[key] = document
+        _cache_document(key, document)
+    return documents
+
+
+class DocumentLoader:
+    """Coalesce concurrent document lookups into one query.
+
+    IDs requested during the same event loop iteration are fetched together
+    by ``get_documents_by_ids``, so a retrieval pass that hydrates many documents
+    makes one round-trip instead of one per document. Results share the
+    ``get_document_by_id`` cache.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self._pending: dict[str, asyncio.Future[Document | None]] = {}
+        self._flush_handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, document_id: str) -> Document | None:
+        """Queue a document lookup and wait for the batch to return it.
+
+        Args:
+            document_id: The document UUID.
+
+        Returns:
+            The document, or None if not found.
+        """
+        # Normalize (and validate) the ID so a malformed one fails here
+        # instead of failing the whole batch
+        key = _cache_key(document_id)
+        cached = _get_cached_document(key)
+        if cached is not None:
+            return cached
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_soon(self._flush)
+
+        # Shielded so a cancelled caller does not cancel a shared future
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        """Start fetching all pending IDs as one batch."""
+        self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, batch: dict[str, asyncio.Future[Document | None]]
+    ) -> None:
+        """Fetch one batch and resolve each caller's future."""
+        try:
+            found = await get_documents_by_ids(self.pool, list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
 
 async def list_documents(
-    pool: asyncpg.Pool, limit: int = 100, offset: int = 0
-) -> list[dict[str, Any]]:
-    """List documents with pagination.
+    pool: asyncpg.Pool,
+    limit: int = 100,
+    after: tuple[datetime, UUID] | None = None,
+) -> list[Document]:
+    """List documents with keyset pagination.
 
     Args:
         pool: Database connection pool.
         limit: Maximum number of documents to return.
-        offset: Number of documents to skip.
+        after: ``(created_at, id)`` of the last document of the previous
+            page, or None for the first page.
 
     Returns:
-        List of document dictionaries.
+        List of documents (without content), newest first.
     """
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, title, source, metadata, created_at, updated_at
-            FROM documents
-            ORDER BY created_at DESC
-            LIMIT $1 OFFSET $2
-            """,
-            limit,
-            offset,
-        )
-        return [dict(row) for row in rows]
+    if after is None:
+        rows = await pool.fetch(SQL_LIST_DOCUMENTS, limit)
+    else:
+        rows = await pool.fetch(SQL_LIST_DOCUMENTS_AFTER, limit, *after)
+    return [Document(*row) for row in rows]
+
+
+async def list_documents_json(
+    pool: asyncpg.Pool,
+    limit: int = 100,
+    after: tuple[datetime, UUID] | None = None,
+) -> bytes:
+    """List documents with keyset pagination as an encoded JSON array.
+
+    PostgreSQL builds the JSON itself, so no records or dicts are created
+    in Python. Meant for HTTP handlers, which can send the result as is
+    with ``Response(content=..., media_type="application/json")``.
+
+    Args:
+        pool: Database connection pool.
+        limit: Maximum number of documents to return.
+        after: ``(created_at, id)`` of the last document of the previous
+            page, or None for the first page.
+
+    Returns:
+        UTF-8 JSON array of documents (without content), newest first.
+    """
+    payload: str
+    if after is None:
+        payload = await pool.fetchval(SQL_LIST_DOCUMENTS_JSON, limit)
+    else:
+        payload = await pool.fetchval(SQL_LIST_DOCUMENTS_AFTER_JSON, limit, *after)
+    return payload.encode()
 
 
 async def get_document_chunks(
     pool: asyncpg.Pool, document_id: str
-) -> list[dict[str, Any]]:
+) -> list[Chunk]:
     """Get all chunks for a document.
 
     Args:
@@ -100,16 +517,84 @@ async def get_document_chunks(
         document_id: The document UUID.
 
     Returns:
-        List of chunk dictionaries ordered by chunk_index.
+        List of chunks ordered by chunk_index.
+    """
+    rows = await pool.fetch(SQL_GET_DOCUMENT_CHUNKS, document_id)
+    return [Chunk(*row) for row in rows]
+
+
+async def iter_document_chunks(
+    pool: asyncpg.Pool, document_id: str, prefetch: int = 256
+) -> AsyncIterator[Chunk]:
+    """Stream the chunks of a document through a server-side cursor.
+
+    Unlike ``get_document_chunks`` the result is never held in memory as
+    a whole; rows are fetched ``prefetch`` at a time as the caller iterates.
+    The connection stays acquired until iteration finishes.
+
+    Args:
+        pool: Database connection pool.
+        document_id: The document UUID.
+        prefetch: Number of rows fetched per round-trip.
+
+    Yields:
+        Chunks ordered by chunk_index.
+    """
+    async with pool.acquire() as conn, conn.transaction():
+        async for row in conn.cursor(
+            SQL_GET_DOCUMENT_CHUNKS, document_id, prefetch=prefetch
+        ):
+            yield Chunk(*row)
+
+
+async def bulk_copy_chunks(
+    pool: asyncpg.Pool,
+    document_id: str,
+    output: Any,
+    copy_format: str = "binary",
+) -> str:
+    """Export the chunks of a document with the COPY protocol.
+
+    Rows are streamed straight to ``output`` without being decoded in
+    Python, which is much cheaper than ``get_document_chunks`` for very
+    large documents (e.g. when ``Document.chunk_count`` is in the
+    thousands).
+
+    Args:
+        pool: Database connection pool.
+        document_id: The document UUID.
+        output: Path, binary file-like object, or async callable that
+            receives the data (see ``asyncpg.Connection.copy_from_query``).
+        copy_format: COPY format: "binary", "csv" or "text".
+
+    Returns:
+        The COPY command status (e.g. "COPY 12000").
     """
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, content, chunk_index, metadata, token_count
-            FROM chunks
-            WHERE document_id = $1
-            ORDER BY chunk_index
-            """,
-            document_id,
+        status: str = await conn.copy_from_query(
+            SQL_GET_DOCUMENT_CHUNKS, document_id, output=output, format=copy_format
         )
-        return [dict(row) for row in rows]
+    return status
+
+
+async def get_document_with_chunks(
+    pool: asyncpg.Pool, document_id: str
+) -> dict[str, Any] | None:
+    """Retrieve a document and all of its chunks in one round-trip.
+
+    Equivalent to ``get_document_by_id`` followed by ``get_document_chunks``,
+    but the chunks are aggregated server-side into a ``chunks`` list, so
+    only one query is sent. Chunk IDs in that list are strings.
+
+    Args:
+        pool: Database connection pool.
+        document_id: The document UUID.
+
+    Returns:
+        Document data with a ``chunks`` list ordered by chunk_index, or
+        None if not found.
+    """
+    row = await pool.fetchrow(SQL_GET_DOCUMENT_WITH_CHUNKS, document_id)
+    if row:
+        return dict(zip(_DOCUMENT_WITH_CHUNKS_COLUMNS, row, strict=True))
+    return None